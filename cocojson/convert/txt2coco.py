@@ -4,8 +4,16 @@ import sys
 import os
 import json
 import glob
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import count
 from pathlib import Path
 
+import numpy as np
+
+from cocojson.utils.common import list_existing_files, write_json
+
 START_BOUNDING_BOX_ID = 1
 # PRE_DEFINE_CATEGORIES = None
 # 如果需要，可以预定义类别及其ID
@@ -27,127 +35,227 @@ PRE_DEFINE_CATEGORIES = {
 
 
 
-def get_categories(txt_files):
-    """从TXT文件列表中生成类别名称到ID的映射。
+def load_txt(txt_file):
+    """用 numpy 一次性解析单个TXT标注文件。
     
     参数:
-        txt_files {list} -- TXT文件路径列表。
+        txt_file {str} -- TXT文件路径。
+    
+    返回:
+        np.ndarray -- 形状为 (N, C) 的数组，空文件返回 size 为 0 的数组。
+    """
+    with warnings.catch_warnings():
+        # 空文件时 loadtxt 会给出警告，此处直接视为无标注
+        warnings.simplefilter("ignore")
+        try:
+            return np.loadtxt(txt_file, delimiter=",", ndmin=2)
+        except ValueError:
+            # 行尾多逗号、6/8 列混合等 loadtxt 不支持的格式，退回逐行解析
+            return load_txt_lines(txt_file)
+
+
+def load_txt_lines(txt_file):
+    """逐行解析单个TXT标注文件，处理 load_txt 无法一次性解析的文件。
+    
+    第7、8列（截断、遮挡）可选，缺省或为空时取 0；格式不正确的行打印警告后跳过。
+    
+    返回:
+        np.ndarray -- 形状为 (N, 8) 的数组。
+    """
+    rows = []
+    with open(txt_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            parts = line.strip().split(",")
+            if len(parts) < 6:
+                print(f"警告: 标注格式不正确 {line}")
+                continue
+            try:
+                extra = [float(p) if p.strip() else 0.0 for p in parts[6:8]]
+                rows.append([float(p) for p in parts[:6]] + extra + [0.0] * (2 - len(extra)))
+            except ValueError as e:
+                print(f"警告: 处理标注时出错 {line}: {e}")
+    return np.array(rows, dtype=np.float64).reshape(-1, 8)
+
+
+def img_file_from_txt(txt_file, img_ext):
+    """由TXT标注路径得到对应的图像路径：目录 annotations 换成 images，后缀换成 img_ext。
+    
+    只替换完整的路径分段和最后的后缀，文件名中出现的 annotations/.txt 不受影响。
+    """
+    txt_path = Path(txt_file)
+    img_path = Path(*("images" if part == "annotations" else part for part in txt_path.parts))
+    return str(img_path.with_suffix(img_ext))
+
+
+def _parse_one(image_id, txt_file, img_file, size, category_ids):
+    """解析单个TXT标注文件及其对应图像，供进程池并行调用。
+    
+    参数:
+        image_id {int} -- 分配给该图像的ID。
+        txt_file {str} -- TXT文件路径。
+        img_file {str} -- 对应的图像文件路径。
+        size {tuple} -- 缓存的图像尺寸 (width, height)，为 None 时读取图像头获取。
+        category_ids {set} -- 合法的类别ID集合，为 None 时不校验（类别由主进程汇总后再分配ID）。
     
     返回:
-        dict -- 类别名称到ID的映射。
+        tuple -- (image, boxes, attrs, size)。boxes 为 (N, 5) 的 x, y, w, h, score，
+        attrs 为 (N, 3) 的 category_id, truncation, occlusion，无标注时均为 None；
+        以紧凑数组而非逐条字典传回主进程，标注字典由主进程统一构建。
+        size 为 None 表示无法读取图像尺寸。标注文件无法读取时 image 为 None，
+        该图像不写入结果，避免被误当作无标注的空图。
     """
-    classes_names = []
-    for txt_file in txt_files:
-        with open(txt_file, 'r') as f:
-            for line in f:
-                parts = line.strip().split(',')
-                if len(parts) >= 6:  # 确保有足够的部分
-                    category = parts[5].strip()
-                    classes_names.append(category)
+    # 获取图像尺寸（PIL 只解析文件头，不解码像素）
+    # 如果无法读取图像，可以从标注中估计或使用默认值
+    if size is None:
+        try:
+            from PIL import Image
+            with Image.open(img_file) as img:
+                size = img.size
+        except:
+            print(f"警告: 无法读取图像 {img_file} 的尺寸，使用默认值")
+    width, height = size if size is not None else (640, 480)  # 默认尺寸
+    
+    image = {
+        "file_name": img_file,
+        "height": height,
+        "width": width,
+        "id": image_id,
+    }
+    
+    # 解析TXT文件中的标注，整个文件一次性交给 numpy 解析
+    try:
+        arr = load_txt(txt_file)
+    except Exception as e:
+        print(f"警告: 处理标注文件时出错 {txt_file}: {e}，跳过该图像")
+        return None, None, None, size
+
+    if arr.size == 0:
+        return image, None, None, size
+    if arr.shape[1] < 6:
+        print(f"警告: 标注格式不正确 {txt_file}")
+        return image, None, None, size
+
+    cats = arr[:, 5].astype(np.int64)
+    valid = np.isin(cats, list(category_ids)) if category_ids is not None else np.ones(len(cats), dtype=bool)
+    if not valid.all():
+        print(f"警告: 未找到类别 {sorted(set(cats[~valid].tolist()))} 的ID ({txt_file})")
+        arr = arr[valid]
+        cats = cats[valid]
+
+    # 可选：截断和遮挡信息
+    extra = arr[:, 6:8]
+    attrs = np.zeros((len(arr), 3), dtype=np.int64)
+    attrs[:, 0] = cats
+    attrs[:, 1 : 1 + extra.shape[1]] = extra
+    return image, arr[:, :5], attrs, size
+
+
+def build_annotations(image_id, boxes, attrs, start_id):
+    """由 _parse_one 返回的数组构建COCO标注字典列表。
+    
+    参数:
+        image_id {int} -- 标注所属图像ID。
+        boxes {np.ndarray} -- (N, 5) 的 x, y, w, h, score。
+        attrs {np.ndarray} -- (N, 3) 的 category_id, truncation, occlusion。
+        start_id {int} -- 第一个标注的ID，其余顺序递增。
     
-    classes_names = list(set(classes_names))
-    classes_names.sort()
-    return {name: i for i, name in enumerate(classes_names)}
+    返回:
+        list -- 标注字典列表。
+    """
+    areas = boxes[:, 2] * boxes[:, 3]
+    return [
+        {
+            "area": area,
+            "iscrowd": 0,
+            "image_id": image_id,
+            "bbox": [x, y, w, h],
+            "category_id": category_id,
+            "id": ann_id,
+            "ignore": 0,
+            "segmentation": [],
+            "score": score,
+            "truncation": truncation,
+            "occlusion": occlusion,
+        }
+        for ann_id, (x, y, w, h, score), area, (category_id, truncation, occlusion) in zip(
+            count(start_id),
+            boxes.tolist(),
+            areas.tolist(),
+            attrs.tolist(),
+        )
+    ]
 
 
-def convert(txt_files, json_file, img_ext=".jpg"):
+def convert(txt_files, json_file, img_ext=".jpg", workers=None, dim_cache=None):
     """将TXT标注文件转换为COCO JSON格式。
     
     参数:
         txt_files {list} -- TXT文件路径列表。
         json_file {str} -- 输出的COCO JSON文件路径。
         img_ext {str} -- 图像文件扩展名，默认为.jpg。
+        workers {int} -- 并行解析的进程数，默认为CPU核数。
+        dim_cache {str} -- 可选的图像尺寸缓存JSON路径，命中时不再打开图像，运行结束后写回。
     """
     json_dict = {"images": [], "type": "instances", "annotations": [], "categories": []}
     
-    if PRE_DEFINE_CATEGORIES is not None:
-        categories = PRE_DEFINE_CATEGORIES
-    else:
-        categories = get_categories(txt_files)
-    
-    category_ids = set(categories.values())
-    if not category_ids:
-        raise ValueError("未找到任何类别")
+    # 未预定义类别时，在解析的同一遍中收集类别，结束后再分配ID
+    categories = PRE_DEFINE_CATEGORIES
+    category_ids = None
+    seen_cats = set()
+    if categories is not None:
+        category_ids = set(categories.values())
+        if not category_ids:
+            raise ValueError("未找到任何类别")
 
     bnd_id = START_BOUNDING_BOX_ID
     
-    for i, txt_file in enumerate(txt_files):
-        # 获取对应的图像文件路径
-        img_file = str(txt_file).replace('annotations', 'images').replace(".txt", img_ext)
-        
-        # 检查图像文件是否存在
-        if not os.path.exists(img_file):
+    # 图像尺寸缓存: {img_file: [width, height]}
+    dims = {}
+    if dim_cache is not None and os.path.isfile(dim_cache):
+        with open(dim_cache, "r") as f:
+            dims = json.load(f)
+
+    img_files = [img_file_from_txt(txt_file, img_ext) for txt_file in txt_files]
+
+    # 检查图像文件是否存在：每个目录只扫描一次，代替逐个文件 stat
+    existing = list_existing_files(img_files)
+    jobs = []
+    for i, (txt_file, img_file) in enumerate(zip(txt_files, img_files)):
+        if img_file not in existing:
             print(f"警告: 文件 {img_file} 不存在")
             continue
-        
-        # 获取图像尺寸（这里需要实际读取图像文件获取尺寸）
-        # 如果无法读取图像，可以从标注中估计或使用默认值
-        try:
-            from PIL import Image
-            img = Image.open(img_file)
-            width, height = img.size
-        except:
-            print(f"警告: 无法读取图像 {img_file} 的尺寸，使用默认值")
-            width, height = 640, 480  # 默认尺寸
-        
-        image_id = i
-        image = {
-            "file_name": img_file,
-            "height": height,
-            "width": width,
-            "id": image_id,
-        }
-        json_dict["images"].append(image)
-        
-        # 解析TXT文件中的标注
-        with open(txt_file, 'r') as f:
-            for line in f:
-                parts = line.strip().split(',')
-                if len(parts) < 6:
-                    print(f"警告: 标注格式不正确 {line}")
-                    continue
-                
-                try:
-                    # 解析边界框坐标和类别
-                    x = float(parts[0])
-                    y = float(parts[1])
-                    w = float(parts[2])
-                    h = float(parts[3])
-                    score = float(parts[4])  # 可选：置信度分数
-                    category_id = int(parts[5].strip())
-                    
-                    # 可选：截断和遮挡信息
-                    truncation = int(parts[6]) if len(parts) > 6 else 0
-                    occlusion = int(parts[7]) if len(parts) > 7 else 0
-                    
-                    if category_id not in category_ids:
-                        raise ValueError(f"未找到类别 {category_id} 的ID")
-                    
-                    # 创建标注对象
-                    ann = {
-                        "area": w * h,
-                        "iscrowd": 0,
-                        "image_id": image_id,
-                        "bbox": [x, y, w, h],
-                        "category_id": category_id,
-                        "id": bnd_id,
-                        "ignore": 0,
-                        "segmentation": [],
-                    }
-                    
-                    # 可选：添加额外信息
-                    if score is not None:
-                        ann["score"] = score
-                    if truncation is not None:
-                        ann["truncation"] = truncation
-                    if occlusion is not None:
-                        ann["occlusion"] = occlusion
-                    
-                    json_dict["annotations"].append(ann)
-                    bnd_id += 1
-                except Exception as e:
-                    print(f"警告: 处理标注时出错 {line}: {e}")
+        jobs.append((i, txt_file, img_file, dims.get(img_file)))
+
+    parse_one = partial(_parse_one, category_ids=category_ids)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as ex:
+        # map 按输入顺序返回，保证 image/annotation id 与串行处理一致
+        results = ex.map(parse_one, *zip(*jobs), chunksize=32) if jobs else []
+        for image, boxes, attrs, size in results:
+            if image is None:
+                continue
+            if size is not None:
+                dims[image["file_name"]] = list(size)
+            json_dict["images"].append(image)
+            if boxes is None:
+                continue
+            json_dict["annotations"].extend(build_annotations(image["id"], boxes, attrs, bnd_id))
+            bnd_id += len(boxes)
+            if categories is None:
+                seen_cats.update(attrs[:, 0].tolist())
+
+    if dim_cache is not None:
+        with open(dim_cache, "w") as f:
+            json.dump(dims, f)
     
+    if categories is None:
+        if not seen_cats:
+            raise ValueError("未找到任何类别")
+        categories = {name: i for i, name in enumerate(sorted(str(c) for c in seen_cats))}
+        for ann in json_dict["annotations"]:
+            ann["category_id"] = categories[str(ann["category_id"])]
+
     # 添加类别信息
     print(f"类别 {categories}")
     for cate, cid in categories.items():
@@ -155,9 +263,7 @@ def convert(txt_files, json_file, img_ext=".jpg"):
         json_dict["categories"].append(cat)
     
     # 写入JSON文件
-    with open(json_file, "w") as json_fp:
-        json_str = json.dumps(json_dict)
-        json_fp.write(json_str)
+    write_json(json_file, json_dict)
     
     return json_dict
 
@@ -171,10 +277,12 @@ if __name__ == "__main__":
     parser.add_argument("txt_dir", help="TXT文件目录路径。", type=str)
     parser.add_argument("json_file", help="输出的COCO格式JSON文件。", type=str)
     parser.add_argument("--img-ext", help="图像文件扩展名，默认为.jpg", default=".jpg", type=str)
+    parser.add_argument("--workers", help="并行解析的进程数，默认为CPU核数", default=None, type=int)
+    parser.add_argument("--dim-cache", help="图像尺寸缓存JSON路径，可加速重复转换", default=None, type=str)
     
     args = parser.parse_args()
     txt_files = glob.glob(os.path.join(args.txt_dir, "**/*.txt"), recursive=True)
     
     print(f"TXT文件数量: {len(txt_files)}")
-    convert(txt_files, args.json_file, args.img_ext)
+    convert(txt_files, args.json_file, args.img_ext, workers=args.workers, dim_cache=args.dim_cache)
     print(f"转换成功: {args.json_file}")
\ No newline at end of file
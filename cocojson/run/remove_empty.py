@@ -12,9 +12,16 @@ def main():
         action="store_true",
         help="Save a separate JSON with only empty images",
     )
+    ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the json with ijson instead of loading it, for files larger than memory",
+    )
     args = ap.parse_args()
 
-    remove_empty_from_files(args.json, out_json=args.out, save_empty=args.save_empty)
+    remove_empty_from_files(
+        args.json, out_json=args.out, save_empty=args.save_empty, stream=args.stream
+    )
 
 
 if __name__ == "__main__":
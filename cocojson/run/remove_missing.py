@@ -16,9 +16,10 @@ def main():
     ap.add_argument("json", help="Path to coco json")
     ap.add_argument("coco_path", help="Path to coco directory")
     ap.add_argument("--out", help="Output json path", type=str)
+    ap.add_argument("--deep_verify", action="store_true", help="Fully verify images with PIL instead of only checking file headers")
     args = ap.parse_args()
 
-    remove_missing_from_files(args.json, args.coco_path, out_json=args.out)
+    remove_missing_from_files(args.json, args.coco_path, out_json=args.out, deep_verify=args.deep_verify)
 
 
 if __name__ == "__main__":
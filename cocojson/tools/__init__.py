@@ -11,7 +11,7 @@ from .match_imgs import match_imgs_from_file
 from .pred_only import pred_only
 from .filter_cat import filter_cat, filter_cat_from_files
 from .coco_catify import coco_catify, coco_catify_from_files
-from .remove_empty import remove_empty, remove_empty_from_files
+from .remove_empty import remove_empty, remove_empty_from_files, remove_empty_streaming
 from .remove_missing import remove_missing_from_files
 from .exclude_json import exclude_images_from_files
 from .merge_jsons import merge_jsons_files, merge_jsons
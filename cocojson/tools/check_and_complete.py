@@ -1,50 +1,61 @@
+from itertools import compress
 from typing import Dict, Any, List, Tuple
 
+import numpy as np
+
 from cocojson.utils.common import read_coco_json, write_json_in_place
 
 
-REQUIRED_TOP_FIELDS = ["info", "licenses", "images", "annotations", "categories"]
+# 顶层必需字段及其默认值
+TOP_FIELD_DEFAULTS = {
+    "info": {
+        "description": "",
+        "url": "",
+        "version": "",
+        "year": 0,
+        "contributor": "",
+        "date_created": "",
+    },
+    "licenses": [],
+    "images": [],
+    "annotations": [],
+    "categories": [],
+}
+REQUIRED_TOP_FIELDS = list(TOP_FIELD_DEFAULTS)
+
+# 各类记录的必需字段及其默认值（按补全时的插入顺序）
+IMAGE_DEFAULTS = {"file_name": "unknown.jpg", "height": 0, "width": 0, "id": 0}
+ANNOTATION_DEFAULTS = {
+    "id": 0,
+    "image_id": 0,
+    "category_id": 0,
+    "bbox": [0, 0, 0, 0],
+    "area": 0,
+    "iscrowd": 0,
+    "segmentation": [],
+}
+CATEGORY_DEFAULTS = {"id": 0, "name": "unknown", "supercategory": "unknown"}
 
 
 def _ensure_top_fields(d: Dict[str, Any]) -> List[str]:
-    added = []
-    for f in REQUIRED_TOP_FIELDS:
-        if f not in d:
-            added.append(f)
-            if f == "info":
-                d[f] = {
-                    "description": "",
-                    "url": "",
-                    "version": "",
-                    "year": 0,
-                    "contributor": "",
-                    "date_created": "",
-                }
-            elif f == "licenses":
-                d[f] = []
-            elif f == "images":
-                d[f] = []
-            elif f == "annotations":
-                d[f] = []
-            elif f == "categories":
-                d[f] = []
-    return added
+    return _fill_missing(d, TOP_FIELD_DEFAULTS)
+
+
+def _fill_missing(item: Dict[str, Any], defaults: Dict[str, Any]) -> List[str]:
+    # 只检查缺失的键，避免逐条 copy 字典再比较；可变默认值每次复制一份
+    missing = [k for k in defaults if k not in item]
+    for k in missing:
+        v = defaults[k]
+        item[k] = v.copy() if isinstance(v, (list, dict)) else v
+    return missing
 
 
 def _complete_images(images: List[Dict[str, Any]]) -> Tuple[int, int]:
     fixed = 0
     filled = 0
     for img in images:
-        before = img.copy()
-        img.setdefault("file_name", "unknown.jpg")
-        img.setdefault("height", 0)
-        img.setdefault("width", 0)
-        img.setdefault("id", 0)
-        if before != img:
-            if any(k not in before for k in ("file_name", "height", "width", "id")):
-                filled += 1
-            else:
-                fixed += 1
+        if _fill_missing(img, IMAGE_DEFAULTS):
+            filled += 1
     return fixed, filled
 
 
@@ -81,72 +92,84 @@ def _rle_from_bbox(bbox: List[float], img_h: int, img_w: int):
     return rle
 
 
+def _img_hw_by_id(images: List[Dict[str, Any]]) -> Dict[int, Tuple[int, int]]:
+    # 准备 image_id -> (h, w)：按列取出 id/height/width，整列转换为整数后一次性 zip 成字典
+    try:
+        ids = np.array([img.get("id") for img in images], dtype=np.int64)
+        heights = np.array([img.get("height", 0) for img in images], dtype=np.int64)
+        widths = np.array([img.get("width", 0) for img in images], dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        # 存在无法转换的值时逐条处理，跳过坏记录
+        img_hw_by_id: Dict[int, Tuple[int, int]] = {}
+        for img in images:
+            try:
+                img_hw_by_id[int(img.get("id"))] = (int(img.get("height", 0)), int(img.get("width", 0)))
+            except Exception:
+                pass
+        return img_hw_by_id
+    return dict(zip(ids.tolist(), zip(heights.tolist(), widths.tolist())))
+
+
 def _complete_annotations(annots: List[Dict[str, Any]], img_hw_by_id: Dict[int, Tuple[int, int]]) -> Tuple[int, int]:
-    fixed = 0
     filled = 0
-    for a in annots:
-        before = a.copy()
-        a.setdefault("id", 0)
-        a.setdefault("image_id", 0)
-        a.setdefault("category_id", 0)
-        a.setdefault("bbox", [0, 0, 0, 0])
-        a.setdefault("area", 0)
-        a.setdefault("iscrowd", 0)
-        # segmentation: polygon 或 RLE
-        seg = a.get("segmentation", None)
-        bbox = a.get("bbox")
-
-        # 若有 bbox 且 area 缺省或为 0，可按 w*h 估算
-        if bbox and isinstance(bbox, list) and len(bbox) == 4:
-            w = bbox[2] if isinstance(bbox[2], (int, float)) else 0
-            h = bbox[3] if isinstance(bbox[3], (int, float)) else 0
-            if (not a.get("area")) and w >= 0 and h >= 0:
-                a["area"] = float(w) * float(h)
-
-        # 补全 segmentation
-        if seg is None:
+    fixed_idx = set()
+    # area 缺省或为 0 且 bbox 合法的标注，稍后统一按 w*h 估算
+    area_idx = []
+    area_fixable = []
+    area_w = []
+    area_h = []
+    for i, a in enumerate(annots):
+        missing = _fill_missing(a, ANNOTATION_DEFAULTS)
+        if missing:
+            filled += 1
+
+        bbox = a["bbox"]
+        if (not a["area"]) and bbox and isinstance(bbox, list) and len(bbox) == 4:
+            area_idx.append(i)
+            area_fixable.append(not missing)
+            area_w.append(bbox[2] if isinstance(bbox[2], (int, float)) else 0)
+            area_h.append(bbox[3] if isinstance(bbox[3], (int, float)) else 0)
+
+        # 补全 segmentation: polygon 或 RLE
+        if a["segmentation"] is None:
             a["segmentation"] = []
-
-        if before != a:
-            if any(
-                k not in before
-                for k in ("id", "image_id", "category_id", "bbox", "area", "iscrowd", "segmentation")
-            ):
-                filled += 1
-            else:
-                fixed += 1
-    return fixed, filled
+            if not missing:
+                fixed_idx.add(i)
+
+    if area_idx:
+        w = np.array(area_w, dtype=np.float64)
+        h = np.array(area_h, dtype=np.float64)
+        valid = (w >= 0) & (h >= 0)
+        areas = w * h
+        for i, fixable, area in zip(
+            compress(area_idx, valid.tolist()),
+            compress(area_fixable, valid.tolist()),
+            areas[valid].tolist(),
+        ):
+            a = annots[i]
+            if fixable and area != a["area"]:
+                fixed_idx.add(i)
+            a["area"] = area
+
+    return len(fixed_idx), filled
 
 
 def _complete_categories(cats: List[Dict[str, Any]]) -> Tuple[int, int]:
     fixed = 0
     filled = 0
     for c in cats:
-        before = c.copy()
-        c.setdefault("id", 0)
-        c.setdefault("name", "unknown")
-        c.setdefault("supercategory", "unknown")
-        if before != c:
-            if any(k not in before for k in ("id", "name", "supercategory")):
-                filled += 1
-            else:
-                fixed += 1
+        if _fill_missing(c, CATEGORY_DEFAULTS):
+            filled += 1
     return fixed, filled
 
 
 def _assign_unique_ids_if_needed(images: List[Dict[str, Any]], annots: List[Dict[str, Any]], cats: List[Dict[str, Any]]):
     # 若存在 0 或重复 id，可顺序重排为唯一 id（仅在必要时）
     def ensure_unique(items: List[Dict[str, Any]], key: str):
-        seen = set()
-        need_reassign = False
-        for it in items:
-            cur = it.get(key, 0)
-            if cur in seen:
-                need_reassign = True
-                break
-            seen.add(cur)
-        if 0 in seen:
-            need_reassign = True
+        ids = [it.get(key, 0) for it in items]
+        # 一次建集合即可同时检测 0 与重复
+        seen = set(ids)
+        need_reassign = 0 in seen or len(seen) != len(ids)
 
         if need_reassign:
             for idx, it in enumerate(items, start=1):
@@ -165,13 +188,7 @@ def check_and_complete_coco_from_file(coco_json: str, out_json: str = None, reas
         print(f"缺少字段: {', '.join(added_top)}，已添加默认值。")
 
     img_fix, img_fill = _complete_images(d["images"]) if d.get("images") is not None else (0, 0)
-    # 准备 image_id -> (h, w)
-    img_hw_by_id: Dict[int, Tuple[int, int]] = {}
-    for img in d.get("images", []):
-        try:
-            img_hw_by_id[int(img.get("id"))] = (int(img.get("height", 0)), int(img.get("width", 0)))
-        except Exception:
-            pass
+    img_hw_by_id = _img_hw_by_id(d.get("images", []))
     ann_fix, ann_fill = _complete_annotations(d["annotations"], img_hw_by_id) if d.get("annotations") is not None else (0, 0)
     cat_fix, cat_fill = _complete_categories(d["categories"]) if d.get("categories") is not None else (0, 0)
 
@@ -12,13 +12,21 @@
 python compare_predictions.py --gt_json gt.json --pred_json pred.json --images_dir /path/to/images --output_dir /path/to/output --iou_threshold 0.5 --score_threshold 0.5
 """
 
-import json
 import os
-import shutil
 import argparse
-from typing import Dict, List, Tuple, Set
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple, Set
 from pathlib import Path
 
+import cv2
+import numpy as np
+
+from cocojson.utils.common import get_img2annots, link_or_copy, read_json, write_json
+
 
 def calculate_iou(box1: List[float], box2: List[float]) -> float:
     """
@@ -53,6 +61,32 @@ def calculate_iou(box1: List[float], box2: List[float]) -> float:
     return intersection / union
 
 
+def pairwise_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """
+    批量计算两组边界框两两之间的IOU，结果与逐对调用 calculate_iou 一致
+    
+    Args:
+        boxes1: (N, 4) 的 [x1, y1, x2, y2] 数组
+        boxes2: (M, 4) 的 [x1, y1, x2, y2] 数组
+    
+    Returns:
+        (N, M) 的 IOU 矩阵
+    """
+    # 广播计算交集，运算顺序与 calculate_iou 一致
+    tl = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    br = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    wh = (br - tl).clip(min=0)
+    intersection = wh[..., 0] * wh[..., 1]
+    
+    # 计算并集，无交集或并集非正时 IOU 为 0
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+    union = area1[:, None] + area2[None, :] - intersection
+    iou = np.zeros_like(intersection)
+    np.divide(intersection, union, out=iou, where=(intersection > 0) & (union > 0))
+    return iou
+
+
 def convert_bbox_format(bbox: List[float], format_type: str = "xywh") -> List[float]:
     """
     转换边界框格式
@@ -74,24 +108,45 @@ def convert_bbox_format(bbox: List[float], format_type: str = "xywh") -> List[fl
         raise ValueError(f"不支持的格式类型: {format_type}")
 
 
+def xywh_to_xyxy_batch(arr: np.ndarray) -> np.ndarray:
+    """
+    批量将 (N, 4) 的 [x, y, width, height] 边界框转换为 [x1, y1, x2, y2]
+    
+    逐框转换请使用 convert_bbox_format
+    """
+    out = arr.copy()
+    out[:, 2] += out[:, 0]
+    out[:, 3] += out[:, 1]
+    return out
+
+
+@lru_cache(maxsize=2)
+def _load_json_cached(abs_path: str, mtime_ns: int, size: int) -> Dict:
+    return read_json(abs_path)
+
+
 def load_json(json_path: str) -> Dict:
-    """加载JSON文件"""
-    with open(json_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """
+    加载JSON文件（安装了 orjson 时使用 orjson 解析）
+
+    以 路径+修改时间+大小 为键缓存解析结果，同一进程内重复加载同一文件时直接复用；
+    返回的字典是共享的，调用方不应修改
+    """
+    st = os.stat(json_path)
+    return _load_json_cached(os.path.abspath(json_path), st.st_mtime_ns, st.st_size)
 
 
-def get_image_filename(image_id: int, images: List[Dict]) -> str:
-    """根据image_id获取图片文件名"""
-    for img in images:
-        if img['id'] == image_id:
-            return img['file_name']
-    return None
+def get_image_filename(image_id: int, id2img: Dict[int, Dict]) -> str:
+    """根据image_id获取图片文件名，id2img 为 image_id -> image 的索引"""
+    img = id2img.get(image_id)
+    return img['file_name'] if img is not None else None
 
 
 def find_matching_annotations(gt_annots: List[Dict], pred_annots: List[Dict], 
                             iou_threshold: float = 0.5) -> Tuple[List[Tuple[Dict, Dict, float]], List[Dict], List[Dict]]:
     """
-    找到匹配的标注和预测框，允许一对多，也就是一个gt 匹配多个 pred
+    找到匹配的标注和预测框，允许一对多，也就是一个gt 匹配多个 pred；
+    每个 pred 只匹配与其 IOU 最大的 gt
 
     Args:
         gt_annots: 标注框列表
@@ -103,28 +158,25 @@ def find_matching_annotations(gt_annots: List[Dict], pred_annots: List[Dict],
         unmatched_gt: 未匹配的GT标注
         unmatched_pred: 未匹配的预测标注
     """
-    matched_pairs = []
-    matched_gt_ids = set()
-    matched_pred_ids = set()
-    
-    # 为每个GT标注找到所有匹配的预测框
-    for gt_annot in gt_annots:
-        for i, pred_annot in enumerate(pred_annots):
-            if i in matched_pred_ids:
-                continue
-                
-            # 转换边界框格式
-            gt_bbox = convert_bbox_format(gt_annot['bbox'])
-            pred_bbox = convert_bbox_format(pred_annot['bbox'])
-            
-            # 计算IOU
-            iou = calculate_iou(gt_bbox, pred_bbox)
-            
-            # 如果IOU超过阈值，认为是匹配的
-            if iou >= iou_threshold:
-                matched_pairs.append((gt_annot, pred_annot, iou))
-                matched_gt_ids.add(gt_annots.index(gt_annot))
-                matched_pred_ids.add(i)
+    if not gt_annots or not pred_annots:
+        return [], list(gt_annots), list(pred_annots)
+
+    # 一次性转换为 (N,4)/(M,4) 的 [x1, y1, x2, y2] 数组
+    gt_boxes = xywh_to_xyxy_batch(np.asarray([a['bbox'] for a in gt_annots], dtype=np.float64).reshape(-1, 4))
+    pred_boxes = xywh_to_xyxy_batch(np.asarray([a['bbox'] for a in pred_annots], dtype=np.float64).reshape(-1, 4))
+
+    iou = pairwise_iou(gt_boxes, pred_boxes)
+
+    # 每个预测框归属于与其 IOU 最大的GT（并列时取靠前的GT），IOU 达到阈值才算匹配
+    pred_gt = iou.argmax(axis=0)
+    pred_matched = iou[pred_gt, np.arange(iou.shape[1])] >= iou_threshold
+    pred_idx = np.flatnonzero(pred_matched)
+    order = np.lexsort((pred_idx, pred_gt[pred_idx]))
+    pairs = [(int(pred_gt[j]), int(j)) for j in pred_idx[order]]
+
+    matched_pairs = [(gt_annots[gi], pred_annots[pi], float(iou[gi, pi])) for gi, pi in pairs]
+    matched_gt_ids = {gi for gi, _ in pairs}
+    matched_pred_ids = {pi for _, pi in pairs}
     
     # 找出未匹配的标注
     unmatched_gt = [gt_annots[i] for i in range(len(gt_annots)) if i not in matched_gt_ids]
@@ -133,8 +185,78 @@ def find_matching_annotations(gt_annots: List[Dict], pred_annots: List[Dict],
     return matched_pairs, unmatched_gt, unmatched_pred
 
 
+def _analyze_one(job: Tuple) -> Tuple[List[Dict], List[Dict], List[Dict], List[Dict]]:
+    """
+    分析单张图片，供进程池调用
+
+    Args:
+        job: (img_id, gt_annots, pred_annots, thresholds)，thresholds 依次为
+            匹配IOU阈值、理想匹配IOU阈值、最低得分阈值、误检得分阈值
+
+    Returns:
+        (高分误检, 低分漏检, 定位精度差, 置信度背离) 四个列表
+    """
+    img_id, gt_annots, pred_annots, thresholds = job
+    iou_threshold, ideal_iou_threshold, minimum_score_threshold, false_positive_score_threshold = thresholds
+    high_score_false_positives = []  # 高分误检
+    low_score_misses = []            # 低分漏检
+    poor_localization = []           # 定位精度差
+    low_confidence_matches = []      # 置信度背离
+
+    if not gt_annots and not pred_annots:
+        return high_score_false_positives, low_score_misses, poor_localization, low_confidence_matches
+
+    # 找到匹配的标注
+    matched_pairs, unmatched_gt, unmatched_pred = find_matching_annotations(
+        gt_annots, pred_annots, iou_threshold=iou_threshold
+    )
+    
+    # 1. 高分误检：高分但未匹配的预测框
+    for pred_annot in unmatched_pred:
+        score = pred_annot.get('score', 0)
+        if score >= false_positive_score_threshold:
+            high_score_false_positives.append({
+                'image_id': img_id,
+                'pred_annot': pred_annot,
+                'score': score
+            })
+    
+    # 2. 低分漏检：未匹配的GT标注（应该有框但没检测到）
+    for gt_annot in unmatched_gt:
+        low_score_misses.append({
+            'image_id': img_id,
+            'gt_annot': gt_annot
+        })
+    
+    # 3. 定位精度差：匹配但IOU较低的预测框
+    for gt_annot, pred_annot, iou in matched_pairs:
+        score = pred_annot.get('score', 0)
+        if iou < ideal_iou_threshold:  # 使用更严格的IOU阈值
+            poor_localization.append({
+                'image_id': img_id,
+                'gt_annot': gt_annot,
+                'pred_annot': pred_annot,
+                'iou': iou,
+                'score': score
+            })
+    
+    # 4. 置信度背离：匹配但置信度较低的预测框
+    for gt_annot, pred_annot, iou in matched_pairs:
+        score = pred_annot.get('score', 0)
+        if score < minimum_score_threshold:  # 使用更低的置信度阈值
+            low_confidence_matches.append({
+                'image_id': img_id,
+                'gt_annot': gt_annot,
+                'pred_annot': pred_annot,
+                'iou': iou,
+                'score': score
+            })
+
+    return high_score_false_positives, low_score_misses, poor_localization, low_confidence_matches
+
+
 def analyze_predictions(gt_json_path: str, pred_json_path: str, 
-                       ) -> Dict:
+                       workers: Optional[int] = None) -> Dict:
     """
     分析预测结果，按照4个角度进行难例挖掘：
     1. 高分误检：高分但未匹配的预测框
@@ -142,28 +264,20 @@ def analyze_predictions(gt_json_path: str, pred_json_path: str,
     3. 定位精度差：匹配但IOU较低的预测框
     4. 置信度背离：匹配但置信度较低的预测框
     
+    Args:
+        workers: 并行分析的进程数，默认为CPU核数，为1时串行
+    
     Returns:
         包含4类难例信息的字典
     """
     # 加载JSON文件
     gt_data = load_json(gt_json_path)
     pred_data = load_json(pred_json_path)
+    id2img = {img['id']: img for img in gt_data['images']}
     
     # 按图片ID分组标注
-    gt_by_image = {}
-    pred_by_image = {}
-    
-    for annot in gt_data['annotations']:
-        img_id = annot['image_id']
-        if img_id not in gt_by_image:
-            gt_by_image[img_id] = []
-        gt_by_image[img_id].append(annot)
-    
-    for annot in pred_data['annotations']:
-        img_id = annot['image_id']
-        if img_id not in pred_by_image:
-            pred_by_image[img_id] = []
-        pred_by_image[img_id].append(annot)
+    gt_by_image = get_img2annots(gt_data['annotations'])
+    pred_by_image = get_img2annots(pred_data['annotations'])
     
     # 分析每张图片
     high_score_false_positives = []  # 高分误检
@@ -185,59 +299,25 @@ def analyze_predictions(gt_json_path: str, pred_json_path: str,
     print(f"GT图片数量: {len(gt_by_image)}")
     print(f"预测图片数量: {len(pred_by_image)}")
 
-    for img_id in set(gt_by_image.keys()) | set(pred_by_image.keys()):
-        gt_annots = gt_by_image.get(img_id, [])
-        pred_annots = pred_by_image.get(img_id, [])
-        
-        if not gt_annots and not pred_annots:
-            continue
-        
-        
-        # 找到匹配的标注
-        matched_pairs, unmatched_gt, unmatched_pred = find_matching_annotations(
-            gt_annots, pred_annots, iou_threshold=iou_threshold
-        )
-        
-        # 1. 高分误检：高分但未匹配的预测框
-        for pred_annot in unmatched_pred:
-            score = pred_annot.get('score', 0)
-            if score >= false_positive_score_threshold:
-                high_score_false_positives.append({
-                    'image_id': img_id,
-                    'pred_annot': pred_annot,
-                    'score': score
-                })
-        
-        # 2. 低分漏检：未匹配的GT标注（应该有框但没检测到）
-        for gt_annot in unmatched_gt:
-            low_score_misses.append({
-                'image_id': img_id,
-                'gt_annot': gt_annot
-            })
-        
-        # 3. 定位精度差：匹配但IOU较低的预测框
-        for gt_annot, pred_annot, iou in matched_pairs:
-            score = pred_annot.get('score', 0)
-            if iou < ideal_iou_threshold:  # 使用更严格的IOU阈值
-                poor_localization.append({
-                    'image_id': img_id,
-                    'gt_annot': gt_annot,
-                    'pred_annot': pred_annot,
-                    'iou': iou,
-                    'score': score
-                })
-        
-        # 4. 置信度背离：匹配但置信度较低的预测框
-        for gt_annot, pred_annot, iou in matched_pairs:
-            score = pred_annot.get('score', 0)
-            if score < minimum_score_threshold:  # 使用更低的置信度阈值
-                low_confidence_matches.append({
-                    'image_id': img_id,
-                    'gt_annot': gt_annot,
-                    'pred_annot': pred_annot,
-                    'iou': iou,
-                    'score': score
-                })
+    thresholds = (iou_threshold, ideal_iou_threshold, minimum_score_threshold, false_positive_score_threshold)
+    jobs = (
+        (img_id, gt_by_image.get(img_id, []), pred_by_image.get(img_id, []), thresholds)
+        for img_id in gt_by_image.keys() | pred_by_image.keys()
+    )
+
+    # 各图片相互独立，按图片分发到进程池；imap 按提交顺序返回，结果与串行一致
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        with Pool(workers) as pool:
+            results = list(pool.imap(_analyze_one, jobs, chunksize=64))
+    else:
+        results = list(map(_analyze_one, jobs))
+
+    for hsfp, lsm, pl, lcm in results:
+        high_score_false_positives.extend(hsfp)
+        low_score_misses.extend(lsm)
+        poor_localization.extend(pl)
+        low_confidence_matches.extend(lcm)
     
     return {
         'high_score_false_positives': high_score_false_positives,
@@ -246,9 +326,61 @@ def analyze_predictions(gt_json_path: str, pred_json_path: str,
         'low_confidence_matches': low_confidence_matches,
         'gt_data': gt_data,
         'pred_data': pred_data,
+        'id2img': id2img,
+        'gt_by_image': gt_by_image,
+        'pred_by_image': pred_by_image,
     }
 
 
+def export_error_image(src_path: str, raw_dst_path: str, vis_dst_path: str,
+                       gt_annots: List[Dict], pred_annots: List[Dict]) -> Tuple[bool, Optional[str]]:
+    """
+    导出单张难例图片：原图硬链接（或拷贝）到 raw，绘制 GT/Pred 框后保存到 vis
+    
+    Returns:
+        (是否导出了原图, 需要打印的提示信息)
+    """
+    # 源文件不存在时直接跳过，不再尝试链接/拷贝和解码
+    if not os.path.isfile(src_path):
+        return False, f"  拷贝原图失败: {src_path}"
+
+    # 拷贝原图到 raw
+    try:
+        link_or_copy(src_path, raw_dst_path)
+    except Exception:
+        # 源文件不存在或其他错误则跳过
+        return False, f"  拷贝原图失败: {src_path}"
+
+    # 生成可视化到 vis（OpenCV 读写与绘制均在 C 层完成，颜色为 BGR）
+    try:
+        img = cv2.imread(src_path, cv2.IMREAD_COLOR)
+        if img is None:
+            raise IOError(f"无法读取图片: {src_path}")
+        # 每组框一次性转换为整数 [x1, y1, x2, y2]
+        def to_xyxy(annots):
+            boxes = np.asarray([ann.get('bbox', [0,0,0,0]) for ann in annots], dtype=np.float64).reshape(-1, 4)
+            return xywh_to_xyxy_batch(boxes).astype(np.int64).tolist()
+
+        # 画 GT（绿色）
+        for x1, y1, x2, y2 in to_xyxy(gt_annots):
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        # 画 Pred（红色），并写 score
+        for ann, (x1, y1, x2, y2) in zip(pred_annots, to_xyxy(pred_annots)):
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            score = ann.get('score', None)
+            if score is not None:
+                text = f"{score:.2f}"
+                cv2.putText(img, text, (x1, max(10, y1 - 3)), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
+        params = [cv2.IMWRITE_JPEG_QUALITY, 90] if vis_dst_path.lower().endswith(('.jpg', '.jpeg')) else []
+        if not cv2.imwrite(vis_dst_path, img, params):
+            raise IOError(f"无法写入图片: {vis_dst_path}")
+    except Exception:
+        # 若绘制失败，仅保留原图
+        return True, f"  生成可视化失败: {src_path}"
+
+    return True, None
+
+
 def copy_error_images(analysis_result: Dict, images_dir: str, output_dir: str) -> None:
     """
     拷贝包含难例的图片到输出目录，按类别分文件夹存储
@@ -272,71 +404,88 @@ def copy_error_images(analysis_result: Dict, images_dir: str, output_dir: str) -
     
     # 拷贝图片到对应类别目录（raw 与 vis 两份）
     total_copied = 0
+    id2img = analysis_result.get('id2img')
+    if id2img is None:
+        id2img = {img['id']: img for img in analysis_result['gt_data']['images']}
     # 预构建 image_id -> annots 的索引
-    gt_annots_all = analysis_result['gt_data'].get('annotations', [])
-    pred_annots_all = analysis_result['pred_data'].get('annotations', [])
-    gt_by_img = {}
-    for ann in gt_annots_all:
-        gt_by_img.setdefault(ann.get('image_id'), []).append(ann)
-    pred_by_img = {}
-    for ann in pred_annots_all:
-        pred_by_img.setdefault(ann.get('image_id'), []).append(ann)
-
-    for i, category in enumerate(categories):
-        category_dir = os.path.join(output_dir, category)
-        raw_dir = os.path.join(category_dir, 'raw')
-        vis_dir = os.path.join(category_dir, 'vis')
-        copied_count = 0
-        
+    gt_by_img = analysis_result.get('gt_by_image')
+    if gt_by_img is None:
+        gt_by_img = get_img2annots(analysis_result['gt_data'].get('annotations', []))
+    pred_by_img = analysis_result.get('pred_by_image')
+    if pred_by_img is None:
+        pred_by_img = get_img2annots(analysis_result['pred_data'].get('annotations', []))
+
+    # 同一张图片可能出现在多个类别中，其可视化结果相同：每张图片只解码、绘制一次，
+    # 其余类别直接链接已生成的 raw/vis 文件
+    jobs_by_category = {}
+    # 子目录数据集中不同图片可能同名，落到同一个目标文件：按目标分组，组内按原顺序执行，后者覆盖前者
+    jobs_by_dst = defaultdict(list)
+    for category in categories:
+        raw_dir = os.path.join(output_dir, category, 'raw')
+        vis_dir = os.path.join(output_dir, category, 'vis')
         os.makedirs(raw_dir, exist_ok=True)
         os.makedirs(vis_dir, exist_ok=True)
 
-        print(f"\n=== {category_names[i]} ===")
-        
+        jobs = []
         for img_id in error_images_by_category[category]:
-            # 从GT或预测数据中获取图片信息
-            img_info = None
-            for img in analysis_result['gt_data']['images']:
-                if img['id'] == img_id:
-                    img_info = img
-                    break
+            # 从GT数据中获取图片信息
+            img_info = id2img.get(img_id)
             
             if img_info:
                 basename = os.path.basename(img_info['file_name'])
-                src_path = os.path.join(images_dir, img_info['file_name'])
-                # 拷贝原图到 raw
-                raw_dst_path = os.path.join(raw_dir, basename)
-                try:
-                    shutil.copy2(src_path, raw_dst_path)
-                except Exception:
-                    print(f"  拷贝原图失败: {src_path}")
-                    # 源文件不存在或其他错误则跳过
-                    continue
+                job = (
+                    img_id,
+                    os.path.join(images_dir, img_info['file_name']),
+                    os.path.join(raw_dir, basename),
+                    os.path.join(vis_dir, basename),
+                )
+                jobs.append(job)
+                jobs_by_dst[job[2]].append(job)
+        jobs_by_category[category] = jobs
+
+    # 每个目标文件最终只保留组内最后一个任务的结果（owner）。每张图片优先选它拥有的目标作为
+    # 主任务，其余类别从主任务链接；没有任何目标的图片仍绘制一次以得到拷贝状态，随后被覆盖
+    owners = {jobs[-1] for jobs in jobs_by_dst.values()}
+    primary_jobs = {}
+    for jobs in jobs_by_dst.values():
+        primary_jobs.setdefault(jobs[-1][0], jobs[-1])
+    for jobs in jobs_by_dst.values():
+        for job in jobs:
+            primary_jobs.setdefault(job[0], job)
+    primaries = set(primary_jobs.values())
+
+    # 拷贝与绘制以 I/O 为主，用线程池并行处理；同一目标的主任务在同一个线程里按顺序执行
+    def export_group(jobs):
+        results = []
+        for img_id, src_path, raw_dst_path, vis_dst_path in jobs:
+            results.append((img_id, export_error_image(
+                src_path, raw_dst_path, vis_dst_path,
+                gt_by_img.get(img_id, []), pred_by_img.get(img_id, []))))
+        return results
+
+    groups = [[job for job in jobs if job in primaries] for jobs in jobs_by_dst.values()]
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        results = dict(chain.from_iterable(ex.map(export_group, [g for g in groups if g])))
 
-                # 生成可视化到 vis
+    for i, category in enumerate(categories):
+        copied_count = 0
+        print(f"\n=== {category_names[i]} ===")
+
+        for job in jobs_by_category[category]:
+            img_id, src_path, raw_dst_path, vis_dst_path = job
+            copied, message = results[img_id]
+            primary = primary_jobs[img_id]
+            # 只有最终拥有该目标的任务需要链接，被同名图片覆盖的任务沿用主任务的结果
+            if copied and job is not primary and job in owners:
                 try:
-                    from PIL import Image, ImageDraw
-                    img = Image.open(src_path).convert('RGB')
-                    draw = ImageDraw.Draw(img)
-                    # 画 GT（绿色）
-                    for ann in gt_by_img.get(img_id, []):
-                        x1, y1, x2, y2 = convert_bbox_format(ann.get('bbox', [0,0,0,0]))
-                        draw.rectangle([x1, y1, x2, y2], outline=(0,255,0), width=2)
-                    # 画 Pred（红色），并写 score
-                    for ann in pred_by_img.get(img_id, []):
-                        x1, y1, x2, y2 = convert_bbox_format(ann.get('bbox', [0,0,0,0]))
-                        draw.rectangle([x1, y1, x2, y2], outline=(255,0,0), width=2)
-                        score = ann.get('score', None)
-                        if score is not None:
-                            text = f"{score:.2f}"
-                            draw.text((x1, max(0, y1-12)), text, fill=(255,0,0))
-                    vis_dst_path = os.path.join(vis_dir, basename)
-                    img.save(vis_dst_path)
+                    link_or_copy(primary[2], raw_dst_path)
+                    if message is None:
+                        link_or_copy(primary[3], vis_dst_path)
                 except Exception:
-                    # 若绘制失败，仅保留原图
-                    print(f"  生成可视化失败: {src_path}")
-                    pass
-
+                    copied, message = False, f"  拷贝原图失败: {src_path}"
+            if message:
+                print(message)
+            if copied:
                 copied_count += 1
 
         print(f"  {category_names[i]} 共拷贝了 {copied_count} 张图片")
@@ -377,18 +526,24 @@ def save_coco_for_category(analysis_result: Dict, category_key: str, base_output
         return [ann for ann in annots if ann.get('image_id') in image_ids]
 
     # 调整 images.file_name 到复制后的路径：{category_key}/raw/basename
-    def filter_and_remap_filename(images):
+    def remap_filename(images):
         remapped = []
-        for img in filter_images(images):
+        for img in images:
             img_copy = dict(img)
             basename = os.path.basename(img_copy.get('file_name', ''))
             img_copy['file_name'] = f"{category_key}/raw/{basename}"
             remapped.append(img_copy)
         return remapped
 
+    # 预测JSON的 images 通常与GT相同：过滤后相等时直接复用GT的结果，不再重复拷贝
+    gt_images = filter_images(gt_data.get('images', []))
+    pred_images = filter_images(pred_data.get('images', []))
+    gt_remapped = remap_filename(gt_images)
+    pred_remapped = gt_remapped if pred_images == gt_images else remap_filename(pred_images)
+
     # --- GT COCO ---
     gt_out = {
-        'images': filter_and_remap_filename(gt_data.get('images', [])),
+        'images': gt_remapped,
         'annotations': filter_annots(gt_data.get('annotations', [])),
     }
     if 'categories' in gt_data:
@@ -398,12 +553,11 @@ def save_coco_for_category(analysis_result: Dict, category_key: str, base_output
     if 'licenses' in gt_data:
         gt_out['licenses'] = gt_data['licenses']
 
-    with open(os.path.join(cocojson_dir, f'{category_key}.gt.json'), 'w', encoding='utf-8') as f:
-        json.dump(gt_out, f, ensure_ascii=False)
+    write_json(os.path.join(cocojson_dir, f'{category_key}.gt.json'), gt_out)
 
     # --- Pred COCO ---
     pred_out = {
-        'images': filter_and_remap_filename(pred_data.get('images', [])),
+        'images': pred_remapped,
         'annotations': filter_annots(pred_data.get('annotations', [])),
     }
     if 'categories' in pred_data:
@@ -413,8 +567,7 @@ def save_coco_for_category(analysis_result: Dict, category_key: str, base_output
     if 'licenses' in pred_data:
         pred_out['licenses'] = pred_data['licenses']
 
-    with open(os.path.join(cocojson_dir, f'{category_key}.pred.json'), 'w', encoding='utf-8') as f:
-        json.dump(pred_out, f, ensure_ascii=False)
+    write_json(os.path.join(cocojson_dir, f'{category_key}.pred.json'), pred_out)
 
 
 def print_analysis_summary(analysis_result: Dict) -> None:
@@ -463,6 +616,7 @@ def main():
     parser.add_argument('--output_dir', required=False, default=None, help='输出目录路径')
     parser.add_argument('--max_copy_num', type=int, default=1000, help='每类最多拷贝多少张图片（若为None则不限制）')
     parser.add_argument('--no_copy', action='store_true', help='不拷贝图片，只进行分析')
+    parser.add_argument('--workers', type=int, default=None, help='并行分析的进程数，默认为CPU核数')
     
     args = parser.parse_args()
     
@@ -487,6 +641,7 @@ def main():
     analysis_result = analyze_predictions(
         args.gt_json, 
         args.pred_json, 
+        workers=args.workers,
     )
     
     # 打印分析结果
@@ -3,7 +3,7 @@ Exclude images from COCO JSON A that are found in COCO JSON B.
 Any images in JSON A that are found in JSON B will be removed (along with associated annotations).
 """
 
-from cocojson.utils.common import read_coco_json, write_json_in_place
+from cocojson.utils.common import read_coco_jsons, write_json_in_place
 
 
 def exclude_images_from_files(json_a, json_b, out_json=None):
@@ -15,8 +15,7 @@ def exclude_images_from_files(json_a, json_b, out_json=None):
         json_b: Path to COCO JSON B (exclusion JSON)
         out_json: Optional output JSON path
     """
-    coco_dict_a, _ = read_coco_json(json_a)
-    coco_dict_b, _ = read_coco_json(json_b)
+    (coco_dict_a, _), (coco_dict_b, _) = read_coco_jsons([json_a, json_b])
     
     out_dict = exclude_images(coco_dict_a, coco_dict_b)
     write_json_in_place(json_a, out_dict, append_str="excluded", out_json=out_json)
@@ -41,17 +40,11 @@ def exclude_images(coco_dict_a, coco_dict_b):
     
     # Filter images from JSON A that are NOT in JSON B
     images_a = coco_dict_a["images"]
-    valid_image_ids = set()
-    
-    for img in images_a:
-        if img["file_name"] not in excluded_file_names:
-            valid_image_ids.add(img["id"])
+    filtered_images = [img for img in images_a if img["file_name"] not in excluded_file_names]
+    valid_image_ids = frozenset(img["id"] for img in filtered_images)
     
     print(f"Keeping {len(valid_image_ids)} / {len(images_a)} images from JSON A")
     
-    # Filter images
-    filtered_images = [img for img in images_a if img["id"] in valid_image_ids]
-    
     # Filter annotations for valid images
     annotations_a = coco_dict_a["annotations"]
     filtered_annotations = [ann for ann in annotations_a if ann["image_id"] in valid_image_ids]
@@ -4,12 +4,34 @@ This tool allows you to extract images and their corresponding annotations
 based on matching image filename prefixes, and optionally save the remaining data.
 """
 
-from copy import deepcopy
 from collections import defaultdict
 
 from cocojson.utils.common import read_coco_json, write_json_in_place
 
 
+# 前缀数量超过该值时改用按长度分桶的集合查找
+MANY_PREFIXES = 32
+
+
+def prefix_matcher(prefixes):
+    """
+    Build a predicate telling whether a filename starts with any of the prefixes.
+    
+    Few prefixes are checked with a single tuple startswith call. For many prefixes,
+    they are bucketed by length so each filename costs one set lookup per distinct
+    prefix length, independent of the number of prefixes.
+    """
+    prefixes = tuple(prefixes)
+    if len(prefixes) <= MANY_PREFIXES:
+        return lambda file_name: file_name.startswith(prefixes)
+
+    by_len = defaultdict(set)
+    for prefix in prefixes:
+        by_len[len(prefix)].add(prefix)
+    buckets = sorted(by_len.items())
+    return lambda file_name: any(file_name[:n] in bucket for n, bucket in buckets)
+
+
 def extract_by_prefix(cocojson, prefixes, output_name=None, save_remaining=True):
     """
     Extract images and annotations from COCO JSON based on filename prefixes.
@@ -33,11 +55,13 @@ def extract_by_prefix(cocojson, prefixes, output_name=None, save_remaining=True)
         "annotations": [],
     }
     
-    # 复制基本信息到两个字典
+    # 复制基本信息到两个字典：licenses/categories 不会被修改，直接共享引用；
+    # info 的 description 会被各自改写，因此各浅拷贝一份
     for dict_key in ["info", "licenses", "categories"]:
         if dict_key in coco_dict:
-            extracted_dict[dict_key] = deepcopy(coco_dict[dict_key])
-            remaining_dict[dict_key] = deepcopy(coco_dict[dict_key])
+            value = coco_dict[dict_key]
+            extracted_dict[dict_key] = dict(value) if dict_key == "info" else value
+            remaining_dict[dict_key] = dict(value) if dict_key == "info" else value
     
     # 建立新旧图片ID的映射
     extracted_img_ids = {}
@@ -46,20 +70,16 @@ def extract_by_prefix(cocojson, prefixes, output_name=None, save_remaining=True)
     new_remaining_id = 1
     
     # 根据前缀筛选图片
+    matches_prefix = prefix_matcher(prefixes)
     for img in coco_dict["images"]:
-        is_extracted = False
-        for prefix in prefixes:
-            if img["file_name"].startswith(prefix):
-                new_img = deepcopy(img)
-                extracted_img_ids[img["id"]] = new_extracted_id
-                new_img["id"] = new_extracted_id
-                extracted_dict["images"].append(new_img)
-                new_extracted_id += 1
-                is_extracted = True
-                break
-        
-        if not is_extracted:
-            new_img = deepcopy(img)
+        if matches_prefix(img["file_name"]):
+            new_img = dict(img)
+            extracted_img_ids[img["id"]] = new_extracted_id
+            new_img["id"] = new_extracted_id
+            extracted_dict["images"].append(new_img)
+            new_extracted_id += 1
+        else:
+            new_img = dict(img)
             remaining_img_ids[img["id"]] = new_remaining_id
             new_img["id"] = new_remaining_id
             remaining_dict["images"].append(new_img)
@@ -70,18 +90,22 @@ def extract_by_prefix(cocojson, prefixes, output_name=None, save_remaining=True)
     new_remaining_ann_id = 1
     
     for ann in coco_dict["annotations"]:
-        if ann["image_id"] in extracted_img_ids:
-            new_ann = deepcopy(ann)
+        # 用 get 同时完成归属判断与新ID查找，每条标注每个映射只查一次
+        new_img_id = extracted_img_ids.get(ann["image_id"])
+        if new_img_id is not None:
+            new_ann = dict(ann)
             new_ann["id"] = new_extracted_ann_id
-            new_ann["image_id"] = extracted_img_ids[ann["image_id"]]
+            new_ann["image_id"] = new_img_id
             extracted_dict["annotations"].append(new_ann)
             new_extracted_ann_id += 1
-        elif save_remaining and ann["image_id"] in remaining_img_ids:
-            new_ann = deepcopy(ann)
-            new_ann["id"] = new_remaining_ann_id
-            new_ann["image_id"] = remaining_img_ids[ann["image_id"]]
-            remaining_dict["annotations"].append(new_ann)
-            new_remaining_ann_id += 1
+        elif save_remaining:
+            new_img_id = remaining_img_ids.get(ann["image_id"])
+            if new_img_id is not None:
+                new_ann = dict(ann)
+                new_ann["id"] = new_remaining_ann_id
+                new_ann["image_id"] = new_img_id
+                remaining_dict["annotations"].append(new_ann)
+                new_remaining_ann_id += 1
     
     # 更新数据集描述
     if "info" in extracted_dict:
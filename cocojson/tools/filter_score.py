@@ -1,11 +1,22 @@
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress
 from pathlib import Path
+import random
 import cv2
-from cocojson.utils.common import read_coco_json, get_img2annots, path, write_json
+import numpy as np
+from cocojson.utils.common import (
+    read_coco_json,
+    get_img2annots,
+    link_or_copy,
+    list_existing_files,
+    path,
+    write_json,
+)
 from cocojson.utils.draw import draw_annot
 import argparse
 import os
 
+
 def filter_and_viz_by_score(
     json_path, img_root, out_dir, min_score=0.5, max_score=None, max_imgs=5000, draw=True
 ):
@@ -14,80 +25,92 @@ def filter_and_viz_by_score(
     out_dir.mkdir(exist_ok=True, parents=True)
 
     coco_dict, _ = read_coco_json(json_path)
-    img2annots = get_img2annots(coco_dict["annotations"])
     assert min_score or max_score, "min_score or max_score must be provided"
+    # 所有标注的 score 一次性转成数组，用向量化比较得到保留掩码，只对保留的标注按图片分组
+    annotations = coco_dict["annotations"]
+    scores = np.array([a.get("score", 1.0) for a in annotations], dtype=np.float64)
+    keep = np.ones(len(scores), dtype=bool)
+    if min_score is not None:
+        keep &= scores >= min_score
+    if max_score is not None:
+        keep &= scores <= max_score
+    img2valid = get_img2annots(compress(annotations, keep.tolist()))
+
     # 第一阶段：先遍历统计并收集候选
+    # 只检查有保留标注的图片是否存在；每个目录 scandir 一次，代替逐张 stat
+    scored_images = [img_dict for img_dict in coco_dict["images"] if img2valid.get(img_dict["id"])]
+    existing = list_existing_files(img_root / img_dict["file_name"] for img_dict in scored_images)
+    # 避免太多的拷贝：扫描时做蓄水池采样（Algorithm R），只保留最多 max_imgs 个候选，
+    # 每个候选被选中的概率与事后 random.sample 相同
     candidates = []
     num_images = 0
     num_boxes = 0
-    for img_dict in coco_dict["images"]:
-        img_id = img_dict["id"]
-        annots = img2annots[img_id]
-        if min_score is not None:
-            valid_annots = [a for a in annots if a.get("score", 1.0) >= min_score]
-        else:
-            valid_annots = annots
-
-        if max_score is not None:
-            valid_annots = [a for a in valid_annots if a.get("score", 1.0) <= max_score]
-
-        if not valid_annots:
-            continue
+    for img_dict in scored_images:
+        valid_annots = img2valid[img_dict["id"]]
 
         img_path = img_root / img_dict["file_name"]
-        if not img_path.is_file():
+        if str(img_path) not in existing:
             print(f"图片不存在: {img_path}")
             continue
 
-        candidates.append((img_dict, annots, valid_annots))
+        if num_images < max_imgs:
+            candidates.append((img_dict, valid_annots))
+        else:
+            j = random.randint(0, num_images)
+            if j < max_imgs:
+                candidates[j] = (img_dict, valid_annots)
         num_images += 1
         num_boxes += len(valid_annots)
 
     print(f"候选图片数: {num_images}，候选框数: {num_boxes}")
-    
-    # 避免太多的拷贝
-    if len(candidates) > max_imgs:
-        import random
-        candidates = random.sample(candidates, max_imgs)
 
     # 第二阶段：拷贝/可视化输出
     out_dir.mkdir(exist_ok=True, parents=True)
     saved = 0
-    for img_dict, __, valid_annots in candidates:
-
+    # 每张图片的读取、画框、写盘整体交给线程池（OpenCV 编解码会释放 GIL）；
+    # map 按提交顺序返回，打印与 file_name 更新仍在主线程按原顺序进行
+    def export(item):
+        img_dict, valid_annots = item
         img_path = img_root / img_dict["file_name"]
-        img_name = os.path.basename(img_dict["file_name"])
-        out_img_path = out_dir / img_name
-
+        out_img_path = out_dir / os.path.basename(img_dict["file_name"])
         if draw:
             img = cv2.imread(str(img_path))
             for annot in valid_annots:
                 draw_annot(img, annot)
+            # 输出位置可能是之前不画框时留下的原图硬链接，先删除再写，避免把框画到原图上
+            if os.path.lexists(out_img_path):
+                os.remove(out_img_path)
             cv2.imwrite(str(out_img_path), img)
         else:
-            shutil.copy(str(img_path), str(out_img_path))
-        saved += 1
+            # 不画框时无需解码，直接硬链接原图；跨设备时只拷贝内容，不需要元数据
+            link_or_copy(str(img_path), str(out_img_path), keep_stat=False)
 
-        img_dict['file_name'] = out_dir.stem + "/" + img_name
-        print(f"拷贝: {img_path}")
-        
+    # 子目录数据集中不同图片可能同名、落到同一个输出文件：每个输出文件只导出最后一张
+    # （与串行时后者覆盖前者一致），同一目标不会被多个线程同时写
+    last_by_dst = {os.path.basename(img_dict["file_name"]): i for i, (img_dict, _) in enumerate(candidates)}
+    export_idx = set(last_by_dst.values())
+
+    # 输出 JSON 的 images/annotations 在同一个循环里收集，标注 id 顺序重排
+    filtered_images = []
+    filtered_annotations = []
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        exports = pool.map(export, [item for i, item in enumerate(candidates) if i in export_idx])
+        for i, (img_dict, valid_annots) in enumerate(candidates):
+            if i in export_idx:
+                # 等待该图片导出完成，导出中的异常在这里抛出
+                next(exports)
+            img_path = img_root / img_dict["file_name"]
+            saved += 1
+            img_dict['file_name'] = out_dir.stem + "/" + os.path.basename(img_dict["file_name"])
+            filtered_images.append(img_dict)
+            for annot in valid_annots:
+                filtered_annotations.append(annot)
+                annot['id'] = len(filtered_annotations)
+            print(f"拷贝: {img_path}")
 
     print(f"共保存了{saved}张图片到{out_dir}")
     
     # 输出对应 images/annotations/categories 的 COCO JSON
-    filtered_images = [img_dict for (img_dict, _, _) in candidates]
-    filtered_annotations = []
-    used_cat_ids = set()
-    for _, __, valid_annots in candidates:
-        filtered_annotations.extend(valid_annots)
-        for a in valid_annots:
-            cid = a.get("category_id")
-            if cid is not None:
-                used_cat_ids.add(cid)
-
-    for i, annot in enumerate(filtered_annotations):
-        annot['id'] = i + 1
-        
     out_coco = {
         "images": filtered_images,
         "annotations": filtered_annotations,
@@ -7,74 +7,56 @@ For example, for merging json files provided by https://www.sama.com/sama-coco-d
 from pathlib import Path 
 from tqdm import tqdm 
 
-from cocojson.utils.common import read_coco_json, write_json
+from cocojson.utils.common import read_coco_jsons, write_json
 
 def merge_jsons_files(
     jsons,
     output_json,
 ):
-    coco_dicts = []
-    for coco_json in jsons:
-        coco_dicts.append(read_coco_json(coco_json)[0])
+    coco_dicts = [coco_dict for coco_dict, _ in read_coco_jsons(jsons)]
 
     out_dict = merge_jsons(coco_dicts)
 
     write_json(output_json, out_dict)
 
 def merge_jsons(coco_dicts):
+    """
+    合并多个COCO字典，分片的 image/annotation 字典会被原地修改ID后并入结果，调用后不应再使用输入分片。
+    """
     merged_dict = coco_dicts[0].copy()
     
     # 初始化ID计数器
     max_img_id = max([img_dict['id'] for img_dict in merged_dict['images']]) if merged_dict['images'] else 0
     max_ann_id = max([ann_dict['id'] for ann_dict in merged_dict['annotations']]) if merged_dict['annotations'] else 0
     
-    # 创建ID映射字典，用于处理ID冲突
-    img_id_mapping = {}
-    ann_id_mapping = {}
-    
-    # 为第一个字典建立初始映射
-    for img_dict in merged_dict['images']:
-        img_id_mapping[img_dict['id']] = img_dict['id']
-    for ann_dict in merged_dict['annotations']:
-        ann_id_mapping[ann_dict['id']] = ann_dict['id']
-    
     for coco_dict in tqdm(coco_dicts[1:]):
-        # 处理images
-        for img_dict in coco_dict['images']:
-            original_img_id = img_dict['id']
-            
-            # 如果ID冲突，分配新的ID
-            if original_img_id in img_id_mapping:
-                max_img_id += 1
-                new_img_id = max_img_id
-                img_id_mapping[original_img_id] = new_img_id
-            else:
-                img_id_mapping[original_img_id] = original_img_id
-                max_img_id = max(max_img_id, original_img_id)
-            
-            # 更新image字典的ID
-            img_dict_copy = img_dict.copy()
-            img_dict_copy['id'] = img_id_mapping[original_img_id]
-            merged_dict['images'].append(img_dict_copy)
+        images = coco_dict['images']
+        annotations = coco_dict['annotations']
+        
+        # 每个分片整体平移一个偏移量，使其ID区间位于已合并ID之后；
+        # 与已合并部分不重叠的分片偏移为0，保持原ID
+        img_off = 0
+        if images:
+            img_ids = [img_dict['id'] for img_dict in images]
+            img_off = max(0, max_img_id + 1 - min(img_ids))
+            max_img_id = max(max_img_id, max(img_ids) + img_off)
+        ann_off = 0
+        if annotations:
+            ann_ids = [ann_dict['id'] for ann_dict in annotations]
+            ann_off = max(0, max_ann_id + 1 - min(ann_ids))
+            max_ann_id = max(max_ann_id, max(ann_ids) + ann_off)
+        
+        # 处理images：原地更新ID，不再逐条复制字典
+        if img_off:
+            for img_dict in images:
+                img_dict['id'] += img_off
+        merged_dict['images'].extend(images)
         
-        # 处理annotations
-        for ann_dict in coco_dict['annotations']:
-            original_ann_id = ann_dict['id']
-            original_img_id = ann_dict['image_id']
-            
-            # 如果annotation ID冲突，分配新的ID
-            if original_ann_id in ann_id_mapping:
-                max_ann_id += 1
-                new_ann_id = max_ann_id
-                ann_id_mapping[original_ann_id] = new_ann_id
-            else:
-                ann_id_mapping[original_ann_id] = original_ann_id
-                max_ann_id = max(max_ann_id, original_ann_id)
-            
-            # 更新annotation字典的ID
-            ann_dict_copy = ann_dict.copy()
-            ann_dict_copy['id'] = ann_id_mapping[original_ann_id]
-            ann_dict_copy['image_id'] = img_id_mapping[original_img_id]
-            merged_dict['annotations'].append(ann_dict_copy)
+        # 处理annotations，image_id 随所属分片的图片偏移
+        if img_off or ann_off:
+            for ann_dict in annotations:
+                ann_dict['id'] += ann_off
+                ann_dict['image_id'] += img_off
+        merged_dict['annotations'].extend(annotations)
     
-    return merged_dict
\ No newline at end of file
+    return merged_dict
@@ -3,11 +3,24 @@ Remove empty/negative images from COCO JSON, aka images without associated annot
 
 Original image IDs are preserved. 
 """
+import os
+from pathlib import Path
 
-from cocojson.utils.common import read_coco_json, write_json_in_place
+from cocojson.utils.common import (
+    ijson,
+    read_coco_header,
+    read_coco_json,
+    stream_coco,
+    write_json,
+    write_json_in_place,
+)
 
 
-def remove_empty_from_files(coco_json, out_json=None,save_empty=False):
+def remove_empty_from_files(coco_json, out_json=None,save_empty=False, stream=False):
+    if stream:
+        if ijson is not None:
+            return remove_empty_streaming(coco_json, out_json=out_json, save_empty=save_empty)
+        print("ijson not installed, falling back to loading the whole json")
     coco_dict, _ = read_coco_json(coco_json)
     out_dict, empty_coco = remove_empty(coco_dict)
     write_json_in_place(coco_json, out_dict, append_str="noempty", out_json=out_json)
@@ -17,8 +30,8 @@ def remove_empty_from_files(coco_json, out_json=None,save_empty=False):
 
 
 def remove_empty(coco_dict):
-    wanted_imgs = set([annot["image_id"] for annot in coco_dict["annotations"]])
-    print(f"reserve {len(set(wanted_imgs))} / {len(coco_dict['images'])} images")
+    wanted_imgs = {annot["image_id"] for annot in coco_dict["annotations"]}
+    print(f"reserve {len(wanted_imgs)} / {len(coco_dict['images'])} images")
 
     empty_images = [img for img in coco_dict["images"] if img["id"] not in wanted_imgs]
     empty_coco = {
@@ -29,3 +42,50 @@ def remove_empty(coco_dict):
     new_imgs = [img for img in coco_dict["images"] if img["id"] in wanted_imgs]
     coco_dict["images"] = new_imgs
     return coco_dict, empty_coco
+
+
+def remove_empty_streaming(coco_json, out_json=None, save_empty=False):
+    """
+    Same as remove_empty_from_files, but never holds images/annotations in memory.
+
+    Pass 1 collects the annotated image ids, pass 2 streams images through the filter
+    and annotations straight to the output; memory is O(#image ids + one record).
+    """
+    coco_json = Path(coco_json)
+    if out_json is None:
+        out_json = coco_json.parent / f"{coco_json.stem}_noempty.json"
+    out_json = Path(out_json)
+    # the input is read while the output is written: writing in place would truncate it
+    # first, so in that case write next to it and swap the file in once all passes are done
+    in_place = out_json.resolve() == coco_json.resolve()
+    write_path = out_json.with_name(f".{out_json.name}.tmp") if in_place else out_json
+
+    header = read_coco_header(coco_json)
+    wanted_imgs = set(stream_coco(coco_json, "annotations", field="image_id"))
+    num_images = 0
+
+    def images_where(annotated):
+        nonlocal num_images
+        for img in stream_coco(coco_json, "images"):
+            num_images += 1
+            if (img["id"] in wanted_imgs) == annotated:
+                yield img
+
+    out_dict = dict(header)
+    out_dict["images"] = images_where(True)
+    out_dict["annotations"] = stream_coco(coco_json, "annotations")
+    write_json(write_path, out_dict)
+    print(f"reserve {len(wanted_imgs)} / {num_images} images")
+
+    if save_empty:
+        empty_coco = {
+            "categories": header["categories"],
+            "images": images_where(False),
+            "annotations": [],
+        }
+        write_json(coco_json.parent / f"{coco_json.stem}_empty.json", empty_coco)
+        print(f"save empty json to {coco_json}_empty.json")
+
+    if in_place:
+        os.replace(write_path, out_json)
+        print(f"Moved json to {out_json}")
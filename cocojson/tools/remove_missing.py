@@ -3,32 +3,72 @@ Remove missing images from COCO JSON, aka images that do not exist in the image
 Original image IDs are preserved. 
 """
 
-from cocojson.utils.common import read_coco_json, write_json_in_place
+from concurrent.futures import ThreadPoolExecutor
+from cocojson.utils.common import read_coco_json, write_json_in_place, list_existing_files
 import os
 
-def remove_missing_from_files(coco_json, image_dir, out_json=None):
+# 并行校验图片的线程数
+VERIFY_WORKERS = 32
+
+def remove_missing_from_files(coco_json, image_dir, out_json=None, deep_verify=False):
     coco_dict, _ = read_coco_json(coco_json)
-    out_dict = remove_missing(coco_dict, image_dir)
+    out_dict = remove_missing(coco_dict, image_dir, deep_verify=deep_verify)
     write_json_in_place(coco_json, out_dict, append_str="check_existence", out_json=out_json)
 
 
-def remove_missing(coco_dict, image_dir):
+# 常见图片格式的文件头
+IMAGE_MAGICS = (
+    b"\xff\xd8",           # JPEG
+    b"\x89PNG\r\n\x1a\n",  # PNG
+    b"BM",                 # BMP
+    b"GIF8",               # GIF
+    b"II*\x00",            # TIFF (little endian)
+    b"MM\x00*",            # TIFF (big endian)
+)
+
+
+def _check_header(full_path):
+    # 只读取文件头判断是否为图片，返回错误信息，正常时返回 None
+    try:
+        with open(full_path, "rb") as f:
+            head = f.read(16)
+    except OSError as e:
+        return str(e)
+    if head.startswith(IMAGE_MAGICS) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP"):
+        return None
+    return "unrecognized image header"
+
+
+def _verify_image(full_path):
+    # 用 PIL 验证图片是否完整，返回错误信息，正常时返回 None
+    try:
+        from PIL import Image
+        with Image.open(full_path) as f_img:
+            f_img.verify()
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def remove_missing(coco_dict, image_dir, deep_verify=False):
+    # deep_verify 为 False 时只检查文件头，为 True 时用 PIL 完整校验
     # 获取所有图片和标注
     images = coco_dict["images"]
     annotations = coco_dict["annotations"]
     
-    # 检查每个图片是否存在
+    # 检查每个图片是否存在：每个目录只扫描一次，代替逐个文件 stat
+    full_paths = [os.path.join(image_dir, img["file_name"]) for img in images]
+    existing = list_existing_files(full_paths)
+    candidates = [(img, full_path) for img, full_path in zip(images, full_paths) if full_path in existing]
+
+    # 校验以文件 I/O 为主，用线程池并行；map 按顺序返回，提示信息顺序不变
+    check = _verify_image if deep_verify else _check_header
     valid_image_ids = set()
-    for img in images:
-        img_path = img["file_name"]
-        if os.path.exists(os.path.join(image_dir, img_path)):
-            try:
-                from PIL import Image
-                f_img = Image.open(os.path.join(image_dir, img_path))
-                f_img.verify()  # 验证图片是否完整
-                f_img.close()
-            except Exception as e:
-                print(f"无法读取图片 {img_path}: {str(e)}")
+    with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as ex:
+        errors = ex.map(check, (full_path for _, full_path in candidates))
+        for (img, _), error in zip(candidates, errors):
+            if error is not None:
+                print(f"无法读取图片 {img['file_name']}: {error}")
                 continue
             valid_image_ids.add(img["id"])
     print(f"reserve {len(valid_image_ids)} / {len(images)} images")
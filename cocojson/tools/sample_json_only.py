@@ -83,6 +83,27 @@ def sample_json_only(json_path, k=10, output_path=None, random_seed=None):
     return output_path
 
 
+def _group_images_by_class(annotations):
+    """
+    按类别收集图片ID，类别与图片ID均保持首次出现的顺序
+    
+    Returns:
+        (类别ID -> 图片ID列表 的 defaultdict, 有标注的图片ID集合)
+    """
+    class_to_images = defaultdict(list)
+    # 用 (类别, 图片) 集合做 O(1) 去重，列表只负责保持顺序
+    seen_pairs = set()
+    seen_img_ids = set()
+    for annot in tqdm(annotations, desc="组织图片按类别"):
+        img_id = annot["image_id"]
+        cat_id = annot["category_id"]
+        if (cat_id, img_id) not in seen_pairs:
+            seen_pairs.add((cat_id, img_id))
+            class_to_images[cat_id].append(img_id)
+        seen_img_ids.add(img_id)
+    return class_to_images, seen_img_ids
+
+
 def sample_by_class_json_only(json_path, class_ks=10, output_path=None, max_img=None, random_seed=None):
     """
     按类别对JSON文件进行采样，不改变图片位置
@@ -119,37 +140,27 @@ def sample_by_class_json_only(json_path, class_ks=10, output_path=None, max_img=
     assert len(class_ks) == num_cats + 1, f"class_ks长度应为 {num_cats + 1}，但得到 {len(class_ks)}"
     
     # 按类别组织图片ID
-    class_to_images = defaultdict(list)
-    seen_img_ids = set()
-    
-    for annot in tqdm(coco_dict["annotations"], desc="组织图片按类别"):
-        img_id = annot["image_id"]
-        cat_id = annot["category_id"]
-        if img_id not in class_to_images[cat_id]:
-            class_to_images[cat_id].append(img_id)
-        seen_img_ids.add(img_id)
+    class_to_images, seen_img_ids = _group_images_by_class(coco_dict["annotations"])
     
     # 处理没有标注的图片
     all_image_ids = {img["id"] for img in coco_dict["images"]}
     empty_image_ids = all_image_ids - seen_img_ids
     class_to_images["empty"] = list(empty_image_ids)
     
-    # 采样
-    sampled_imgs = []
+    # 采样，直接累积到集合中去重
+    sampled_imgs = set()
     for imgs, k in zip(class_to_images.values(), class_ks):
         if k > len(imgs):
             sampled = imgs
         else:
             sampled = _sample(imgs, k)
-        sampled_imgs.extend(sampled)
-    
-    sampled_imgs = list(set(sampled_imgs))  # 去重
+        sampled_imgs.update(sampled)
     
     # 检查是否超过最大图片数量限制
     if max_img and len(sampled_imgs) > max_img:
         print(f"警告: 采样结果 {len(sampled_imgs)} 张图片超过限制 {max_img} 张")
-        # 随机选择max_img张图片
-        sampled_imgs = _sample(sampled_imgs, max_img)
+        # 随机选择max_img张图片（random.sample 需要序列）
+        sampled_imgs = set(_sample(list(sampled_imgs), max_img))
     
     # 筛选图片和标注
     sampled_images = [img for img in coco_dict["images"] if img["id"] in sampled_imgs]
@@ -1,27 +1,182 @@
 import json
-from shutil import copy
+import math
+import mmap
+from shutil import copy, copyfileobj, copystat
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
 import filecmp
 from functools import reduce
 from operator import getitem
+from itertools import count, islice
+from collections.abc import Iterator
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 IMG_EXTS = [".jpg", ".jpeg", ".png", ".tiff", ".tif", ".bmp", ".gif", ".webp"]
 IMG_EXTS = [x.lower() for x in IMG_EXTS] + [x.upper() for x in IMG_EXTS]
 
+# number of list elements serialized per orjson.dumps call in write_json
+WRITE_BATCH = 10000
+
+# per-process counter that makes link_or_copy temp names unique across threads
+_LINK_TMP_IDS = count()
+
+
+def _advise_sequential(f, mm=None):
+    # hint the kernel to read ahead aggressively, the whole file is scanned front to back
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+    if mm is not None and hasattr(mmap, "MADV_SEQUENTIAL"):
+        try:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+
+def _loads(content):
+    # orjson is strict and rejects NaN/Infinity, which json accepts (e.g. NaN scores
+    # in prediction dumps); such documents are re-parsed with json
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(content)
+
 
 def read_json(json_path):
     if os.path.isfile(json_path):
-        with open(json_path, "r") as f:
+        # an empty file cannot be mmapped; json below raises the usual JSONDecodeError
+        if orjson is not None and os.path.getsize(json_path):
+            # parse straight from the page cache, no intermediate str of the file
+            try:
+                with open(json_path, "rb") as f, mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                ) as mm:
+                    _advise_sequential(f, mm)
+                    with memoryview(mm) as buf:
+                        return orjson.loads(buf)
+            except orjson.JSONDecodeError:
+                pass
+        with open(json_path, "r", encoding="utf-8") as f:
             d = json.load(f)
     else:
-        d = json.loads(json_path)
+        d = _loads(json_path)
     return d
 
 
+def stream_coco(json_path, section, field=None):
+    # yield the elements of one top-level list (e.g. "images"), or just one field of
+    # each element, without loading the file; peak memory is a single record
+    prefix = f"{section}.item" if field is None else f"{section}.item.{field}"
+    with open(json_path, "rb") as f:
+        _advise_sequential(f)
+        yield from ijson.items(f, prefix, use_float=True)
+
+
+def read_coco_header(json_path, skip=("images", "annotations")):
+    # top-level entries in file order; the skipped (big) sections are only tokenized
+    # and kept as None placeholders so callers can fill them in the original order
+    header = {}
+    with open(json_path, "rb") as f:
+        _advise_sequential(f)
+        key, builder = None, None
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == "" and event in ("map_key", "end_map"):
+                if key is not None:
+                    header[key] = None if builder is None else builder.value
+                key = value
+                builder = None if key in skip else ijson.ObjectBuilder()
+            elif builder is not None:
+                builder.event(event, value)
+    return header
+
+
+def _has_nonfinite(obj):
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_nonfinite(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_nonfinite(v) for v in obj)
+    return False
+
+
+def _json_default(obj):
+    # numpy scalars/arrays, which orjson serializes natively via OPT_SERIALIZE_NUMPY
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj, option):
+    # orjson writes NaN/Infinity as null, json keeps them (and read_json reads them back);
+    # only a chunk whose output contains null can hold one, so only those are checked
+    # in python and, if needed, serialized with json instead
+    out = orjson.dumps(obj, option=option)
+    if b"null" in out and _has_nonfinite(obj):
+        out = json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_json_default).encode("utf-8")
+    return out
+
+
+def _write_list_batched(f, items, option):
+    # items may be a list or any iterator (e.g. from stream_coco)
+    f.write(b"[")
+    items = iter(items)
+    batch = list(islice(items, WRITE_BATCH))
+    while batch:
+        f.write(memoryview(_dumps(batch, option))[1:-1])
+        batch = list(islice(items, WRITE_BATCH))
+        if batch:
+            f.write(b",")
+    f.write(b"]")
+
+
 def write_json(json_path, dic):
-    with open(json_path, "w") as f:
-        json.dump(dic, f)
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        with open(json_path, "wb", buffering=1 << 20) as f:
+            if isinstance(dic, dict):
+                # serialize one top-level entry at a time (images, annotations, ...)
+                # so only a single section's bytes are alive, never the whole document
+                f.write(b"{")
+                for i, (key, value) in enumerate(dic.items()):
+                    if i:
+                        f.write(b",")
+                    if isinstance(value, Iterator) or (
+                        isinstance(value, list) and len(value) > WRITE_BATCH
+                    ):
+                        # big lists and streamed sections are written WRITE_BATCH elements at a time
+                        f.write(memoryview(orjson.dumps({key: None}, option=option))[1:-5])
+                        _write_list_batched(f, value, option)
+                    else:
+                        f.write(memoryview(_dumps({key: value}, option))[1:-1])
+                f.write(b"}")
+            elif isinstance(dic, Iterator) or (isinstance(dic, list) and len(dic) > WRITE_BATCH):
+                _write_list_batched(f, dic, option)
+            else:
+                f.write(_dumps(dic, option))
+    else:
+        if isinstance(dic, dict):
+            dic = {k: list(v) if isinstance(v, Iterator) else v for k, v in dic.items()}
+        elif isinstance(dic, Iterator):
+            dic = list(dic)
+        with open(json_path, "w") as f:
+            json.dump(dic, f)
     print(f"Wrote json to {json_path}")
 
 
@@ -44,6 +199,58 @@ def assure_copy(src, dst):
     copy(src, dst)
 
 
+def link_or_copy(src, dst, keep_stat=True):
+    # hardlink on the same filesystem (no bytes copied), otherwise copy the bytes,
+    # carrying metadata over like copy2 when keep_stat
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    # the new file is built under a name unique to this call and then moved onto dst:
+    # an existing dst is never removed first or written through (it may be a hardlink to
+    # a source image), and concurrent calls for the same dst never share a temp file
+    tmp = f"{dst}.{os.getpid()}.{next(_LINK_TMP_IDS)}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        # exclusively created temp file, so the copy never writes into an existing path
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fdst, open(src, "rb") as fsrc:
+                copyfileobj(fsrc, fdst, 1 << 20)
+            if keep_stat:
+                copystat(src, tmp)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    try:
+        os.replace(tmp, dst)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def list_existing_files(file_paths):
+    # one os.scandir per parent directory instead of one stat per file
+    by_dir = defaultdict(list)
+    for file_path in file_paths:
+        file_path = str(file_path)
+        by_dir[os.path.dirname(file_path)].append(file_path)
+
+    existing = set()
+    for dir_path, dir_files in by_dir.items():
+        try:
+            with os.scandir(dir_path or ".") as it:
+                names = {entry.name for entry in it if entry.is_file()}
+        except OSError:
+            names = set()
+        for f in dir_files:
+            # names only match byte for byte; case-insensitive or normalizing filesystems
+            # (macOS, Windows) may still resolve e.g. IMG.JPG for img.jpg, so anything not
+            # in the listing gets a regular stat before it is reported missing
+            if os.path.basename(f) in names or os.path.isfile(f):
+                existing.add(f)
+    return existing
+
+
 def get_imgnames_dict(coco_dict_images):
     return {d["id"]: d["file_name"] for d in coco_dict_images}
 
@@ -87,6 +294,32 @@ def read_coco_json(coco_json):
     return coco_dict, setname
 
 
+def _read_bytes(file_path):
+    with open(file_path, "rb") as f:
+        _advise_sequential(f)
+        return f.read()
+
+
+def read_coco_jsons(coco_jsons, workers=8):
+    # file reads release the GIL, so fetching the next inputs concurrently keeps the disk
+    # queue busy; parsing happens in input order on the calling thread. At most `workers`
+    # reads run ahead of the parser, so raw bytes of only that many files are held at once
+    coco_jsons = iter(coco_jsons)
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        pending = deque((p, ex.submit(_read_bytes, p)) for p in islice(coco_jsons, max(1, workers)))
+        while pending:
+            coco_json, future = pending.popleft()
+            content = future.result()
+            nxt = next(coco_jsons, None)
+            if nxt is not None:
+                pending.append((nxt, ex.submit(_read_bytes, nxt)))
+            coco_dict = _loads(content)
+            del content
+            results.append((coco_dict, get_setname(coco_dict, coco_json)))
+    return results
+
+
 def get_imgs_from_dir(dirpath):
     return sorted(
         [img for img in dirpath.rglob("*") if img.is_file() and img.suffix in IMG_EXTS]